@@ -3,6 +3,9 @@ import fcntl
 import logging
 import os
 import signal
+from importlib.metadata import entry_points
+from itertools import chain
+from operator import attrgetter
 from os.path import join
 from threading import Condition, RLock
 from threading import Event as TEvent
@@ -10,8 +13,6 @@ from threading import Lock
 from time import sleep
 from typing import Sequence, cast
 
-import pkg_resources
-
 from .logging import set_log_plugin, setup_logger, update_log_plugins
 from .plugins import (
     Config,
@@ -55,10 +56,12 @@ class EmitHolder(Emitter):
                 self._events.append(event)
             self._condition.notify_all()
 
-    def get_events(self, timeout: int = -1) -> Sequence[Event]:
+    def get_events(self, timeout: float = -1) -> Sequence[Event]:
+        """Returns the pending events. If a timeout is provided, waits up to
+        `timeout` seconds for an event to arrive. -1 does not wait."""
         with self._condition:
-            if not self._events and timeout != -1:
-                self._condition.wait()
+            if timeout != -1:
+                self._condition.wait_for(lambda: bool(self._events), timeout)
             ev = self._events
             self._events = []
             return ev
@@ -152,8 +155,8 @@ def main():
             else:
                 logger.error(f"Command '{args.command[0]}' is unknown. Ignoring...")
 
-        for autodetect in pkg_resources.iter_entry_points("hhd.plugins"):
-            detectors[autodetect.name] = autodetect.resolve()
+        for autodetect in entry_points(group="hhd.plugins"):
+            detectors[autodetect.name] = autodetect.load()
 
         logger.info(f"Found plugin providers: {', '.join(list(detectors))}")
 
@@ -169,10 +172,9 @@ def main():
         logger.info(plugin_str)
 
         # Get sorted plugins
-        sorted_plugins: Sequence[HHDPlugin] = []
-        for plugs in plugins.values():
-            sorted_plugins.extend(plugs)
-        sorted_plugins.sort(key=lambda x: x.priority)
+        sorted_plugins: Sequence[HHDPlugin] = sorted(
+            chain.from_iterable(plugins.values()), key=attrgetter("priority")
+        )
 
         if not sorted_plugins:
             logger.error(f"No plugins started, exiting...")
@@ -245,7 +245,7 @@ class GenericGamepadEvdev(Producer, Consumer):
 
         while can_read(self.fd):
             for e in self.dev.read():
-                if e.type == B("EV_KEY"):
+                if e.type == ecodes.EV_KEY:
                     if e.code in self.btn_map:
                         out.append(
                             {
@@ -254,7 +254,7 @@ class GenericGamepadEvdev(Producer, Consumer):
                                 "value": bool(e.value),
                             }
                         )
-                elif e.type == B("EV_ABS"):
+                elif e.type == ecodes.EV_ABS:
                     if e.code in self.axis_map:
                         # Normalize
                         val = e.value / abs(
@@ -2,7 +2,7 @@ import logging
 from typing import Sequence, cast
 
 import evdev
-from evdev import UInput, AbsInfo
+from evdev import UInput, AbsInfo, ecodes
 
 from hhd.controller import Axis, Button, Consumer, Producer
 from hhd.controller.base import Event, can_read
@@ -68,7 +68,7 @@ class UInputDevice(Consumer, Producer):
                         val = int(ax.scale * ev["value"] + ax.offset)
                         if ax.bounds:
                             val = min(max(val, ax.bounds[0]), ax.bounds[1])
-                        self.dev.write(B("EV_ABS"), ax.id, val)
+                        self.dev.write(ecodes.EV_ABS, ax.id, val)
                     elif self.output_timestamps and ev["code"] in (
                         "accel_ts",
                         "gyro_ts",
@@ -80,12 +80,12 @@ class UInputDevice(Consumer, Producer):
                         if ts > self.ofs + 2**30:
                             self.ofs = ts
                         ts -= self.ofs
-                        self.dev.write(B("EV_MSC"), B("MSC_TIMESTAMP"), ts)
+                        self.dev.write(ecodes.EV_MSC, ecodes.MSC_TIMESTAMP, ts)
                         pass
                 case "button":
                     if ev["code"] in self.btn_map:
                         self.dev.write(
-                            B("EV_KEY"),
+                            ecodes.EV_KEY,
                             self.btn_map[ev["code"]],
                             1 if ev["value"] else 0,
                         )
@@ -99,15 +99,15 @@ class UInputDevice(Consumer, Producer):
 
         while can_read(self.fd):
             for ev in self.dev.read():
-                if ev.type == B("EV_MSC") and ev.code == B("MSC_TIMESTAMP"):
+                if ev.type == ecodes.EV_MSC and ev.code == ecodes.MSC_TIMESTAMP:
                     # Skip timestamp feedback
                     # TODO: Figure out why it feedbacks
                     pass
-                elif ev.type == B("EV_UINPUT"):
-                    if ev.code == B("UI_FF_UPLOAD"):
+                elif ev.type == ecodes.EV_UINPUT:
+                    if ev.code == ecodes.UI_FF_UPLOAD:
                         # Keep uploaded effect to apply on input
                         upload = self.dev.begin_upload(ev.value)
-                        if upload.effect.type == B("FF_RUMBLE"):
+                        if upload.effect.type == ecodes.FF_RUMBLE:
                             data = upload.effect.u.ff_rumble_effect
 
                             self.rumble = {
@@ -117,19 +117,19 @@ class UInputDevice(Consumer, Producer):
                                 "strong_magnitude": data.strong_magnitude / 0xFFFF,
                             }
                         self.dev.end_upload(upload)
-                    elif ev.code == B("UI_FF_ERASE"):
+                    elif ev.code == ecodes.UI_FF_ERASE:
                         # Ignore erase events
                         erase = self.dev.begin_erase(ev.value)
                         erase.retval = 0
                         ev.end_erase(erase)
-                elif ev.type == B("EV_FF") and ev.value:
+                elif ev.type == ecodes.EV_FF and ev.value:
                     if self.rumble:
                         out.append(self.rumble)
                     else:
-                        logger.warn(
+                        logger.warning(
                             f"Rumble requested but a rumble effect has not been uploaded."
                         )
-                elif ev.type == B("EV_FF") and not ev.value:
+                elif ev.type == ecodes.EV_FF and not ev.value:
                     out.append(
                         {
                             "type": "rumble",
@@ -19,10 +19,12 @@ def load_relative_yaml(fn: str):
     import os
     import yaml
 
+    from .settings import _Loader
+
     script_fn = inspect.currentframe().f_back.f_globals["__file__"]  # type: ignore
     dirname = os.path.dirname(script_fn)
     with open(os.path.join(dirname, fn), "r") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_Loader)
 
 
 __all__ = [
@@ -1,18 +1,31 @@
+import hashlib
 import logging
-from functools import reduce
+import os
+import textwrap
+from contextlib import contextmanager
+from itertools import chain, islice, pairwise
 from typing import (
     Any,
+    Iterator,
     Literal,
     Mapping,
     MutableMapping,
     Sequence,
+    TextIO,
     TypedDict,
     cast,
 )
 from copy import copy
 
+import yaml
+
 from .conf import Config
 
+# Prefer the libyaml bindings, fall back to pure python if unavailable
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+_md5 = hashlib.md5
+
 #
 # UI settings
 #
@@ -140,55 +153,51 @@ class Mode(TypedDict):
     default: str | None
 
 
-STATE_HEADER = (
-    "\n"
-    + "# Handheld Daemon State Config\n"
-    + "#\n"
-    + "# This file contains plugin software-only configuration that will be retained\n"
-    + "# across reboots. You may edit this file in lueu of using a frontend.\n"
-    + "#\n"
-    + "# Parameters that are stored in hardware (TDP, RGB colors, etc) and\n"
-    + "# risky parameters that might cause instability and should be reset\n"
-    + "# across sessions are not part of this file.\n"
-    + "# Use profiles to apply changes to these settings.\n"
-    + "#\n"
-    + "# Persisted (software) parameters are marked by having a default value.\n"
-    + "# Non-persisted/hardware parameters do not have a default value.\n"
-    + "#\n"
-    + "# This file and comments are autogenerated. Your comments will be discarded\n"
-    + "# during configuration changes. Parameters with the value `default` are\n"
-    + "# ignored and are meant as a template for you to change them.\n"
-    + "#\n"
-    + "# - CONFIGURATION PARAMETERS\n"
-    + "#"
-)
+STATE_HEADER = """
+# Handheld Daemon State Config
+#
+# This file contains plugin software-only configuration that will be retained
+# across reboots. You may edit this file in lueu of using a frontend.
+#
+# Parameters that are stored in hardware (TDP, RGB colors, etc) and
+# risky parameters that might cause instability and should be reset
+# across sessions are not part of this file.
+# Use profiles to apply changes to these settings.
+#
+# Persisted (software) parameters are marked by having a default value.
+# Non-persisted/hardware parameters do not have a default value.
+#
+# This file and comments are autogenerated. Your comments will be discarded
+# during configuration changes. Parameters with the value `default` are
+# ignored and are meant as a template for you to change them.
+#
+# - CONFIGURATION PARAMETERS
+#"""
 
-PROFILE_HEADER = (
-    "\n"
-    + "# Handheld Daemon Profile Config\n"
-    + "#\n"
-    + "# This file contains the configuration options that will be set when\n"
-    + "# applying the profile which shares this file name.\n"
-    + "#\n"
-    + "# Settings are applied once, when applying the profile, and only the ones\n"
-    + "# that are stated change. Therefore, they may drift as the system state changes\n"
-    + "# (e.g., using native TDP shortcuts, or controller profile shortcuts).\n"
-    + "#\n"
-    + "# It is possible to set all supported parameters using profiles, and\n"
-    + "# it is encouraged for you to stack profiles together.\n"
-    + "#\n"
-    + "# For example, you can have TDP only profiles that control the energy budget,\n"
-    + "# and controller profiles that switch controller behavior.\n"
-    + "# Then, depending on the game, you can apply the appropriate 2 profiles\n"
-    + "# together.\n"
-    + "#\n"
-    + "# This file and comments are autogenerated. Your comments will be discarded\n"
-    + "# during configuration changes. Parameters with the value `unset` are\n"
-    + "# ignored and are meant to act as a template for you to change them.\n"
-    + "#\n"
-    + "# - CONFIGURATION PARAMETERS\n"
-    + "#"
-)
+PROFILE_HEADER = """
+# Handheld Daemon Profile Config
+#
+# This file contains the configuration options that will be set when
+# applying the profile which shares this file name.
+#
+# Settings are applied once, when applying the profile, and only the ones
+# that are stated change. Therefore, they may drift as the system state changes
+# (e.g., using native TDP shortcuts, or controller profile shortcuts).
+#
+# It is possible to set all supported parameters using profiles, and
+# it is encouraged for you to stack profiles together.
+#
+# For example, you can have TDP only profiles that control the energy budget,
+# and controller profiles that switch controller behavior.
+# Then, depending on the game, you can apply the appropriate 2 profiles
+# together.
+#
+# This file and comments are autogenerated. Your comments will be discarded
+# during configuration changes. Parameters with the value `unset` are
+# ignored and are meant to act as a template for you to change them.
+#
+# - CONFIGURATION PARAMETERS
+#"""
 
 
 Section = MutableMapping[str, Container]
@@ -196,47 +205,62 @@ Section = MutableMapping[str, Container]
 HHDSettings = Mapping[str, Section]
 
 
-def parse(d: Setting | Container | Mode, prev: Sequence[str], out: MutableMapping):
-    new_prev = list(prev)
-    match d["type"]:
-        case "container":
-            for k, v in d["children"].items():
-                parse(v, new_prev + [k], out)
-        case "mode":
-            out[".".join(new_prev) + ".mode"] = d.get("default", None)
+def walk_defaults(
+    d: Setting | Container | Mode, prefix: str
+) -> Iterator[tuple[str, Any]]:
+    # Explicit stack, children are pushed in reverse to keep the tree order
+    stack = [(d, prefix)]
+    while stack:
+        d, prefix = stack.pop()
+        match d["type"]:
+            case "container":
+                stack.extend(
+                    (v, f"{prefix}.{k}") for k, v in reversed(d["children"].items())
+                )
+            case "mode":
+                yield prefix + ".mode", d.get("default", None)
+                stack.extend(
+                    (v, f"{prefix}.{k}") for k, v in reversed(d["modes"].items())
+                )
+            case other:
+                yield prefix, d.get("default", None)
 
-            for k, v in d["modes"].items():
-                parse(v, new_prev + [k], out)
-        case other:
-            out[".".join(new_prev)] = d.get("default", None)
+
+# Defaults of the last settings object, cached by identity like render_settings()
+_defaults_cache: tuple[HHDSettings, dict[str, Any]] | None = None
 
 
 def parse_defaults(sets: HHDSettings):
-    out = {}
-    for name, sec in sets.items():
-        for cname, cont in sec.items():
-            parse(cont, [name, cname], out)
-    return out
+    global _defaults_cache
+    if _defaults_cache is None or _defaults_cache[0] is not sets:
+        defaults = dict(
+            chain.from_iterable(
+                walk_defaults(cont, f"{name}.{cname}")
+                for name, sec in sets.items()
+                for cname, cont in sec.items()
+            )
+        )
+        _defaults_cache = (sets, defaults)
+    # Copy so that callers can not modify the cached defaults
+    return dict(_defaults_cache[1])
 
 
-def fill_in_defaults(s: Setting | Container | Mode):
+def fill_in_node(s: Setting | Container | Mode):
+    """Fills in the defaults of a single setting. The children of containers
+    and modes are left empty for the caller to fill in."""
     s = copy(s)
+    t = s["type"]
     s["family"] = s.get("family", [])
     s["title"] = s.get("title", "")
     s["hint"] = s.get("hint", None)
-    if s["type"] != "container":
+    if t != "container":
         s["default"] = s.get("default", None)
 
-    match s["type"]:
+    match t:
         case "container":
-            s["children"] = {
-                k: fill_in_defaults(v) for k, v in s.get("children", {}).items()
-            }
+            s["children"] = {}
         case "mode":
-            s["modes"] = {
-                k: cast(Container, fill_in_defaults(v))
-                for k, v in s.get("modes", {}).items()
-            }
+            s["modes"] = {}
         case "multiple":
             s["options"] = s.get("options", {})
         case "discrete":
@@ -247,163 +271,210 @@ def fill_in_defaults(s: Setting | Container | Mode):
     return s
 
 
-def merge_reduce(
-    a: Setting | Container | Mode, b: Setting | Container | Mode
-) -> Setting | Container | Mode:
-    if a["type"] != b["type"]:
-        return fill_in_defaults(b)
-
-    match a["type"]:
+def flatten_settings(
+    s: Setting | Container | Mode,
+    path: tuple[str, ...],
+    flat: MutableMapping[tuple[str, ...], Setting | Container | Mode],
+):
+    t = s["type"]
+    prev = flat.get(path, None)
+    if prev is not None and prev["type"] != t:
+        # A setting with a different type replaces the previous one fully
+        for p in [p for p in flat if len(p) > len(path) and p[: len(path)] == path]:
+            del flat[p]
+    flat[path] = fill_in_node(s)
+
+    match t:
         case "container":
-            out = cast(Container, dict(b))
-            new_children = dict(a.get("children", {}))
-            for k, v in b.items():
-                if k in out:
-                    out[k] = merge_reduce(out[k], b[k])
-                else:
-                    out[k] = v
-            out["children"] = new_children
-            return fill_in_defaults(out)
+            for k, v in s.get("children", {}).items():
+                flatten_settings(v, path + (k,), flat)
         case "mode":
-            out = cast(Mode, dict(b))
-            new_children = dict(a.get("modes", {}))
-            for k, v in b.items():
-                if k in out:
-                    out[k] = merge_reduce(out[k], b[k])
-                else:
-                    out[k] = v
-            out["modes"] = new_children
-            return fill_in_defaults(out)
-        case _:
-            return fill_in_defaults(b)
-
+            for k, v in s.get("modes", {}).items():
+                flatten_settings(v, path + (k,), flat)
 
-def merge_reduce_sec(a: Section, b: Section):
-    out = {k: cast(Container, fill_in_defaults(v)) for k, v in a.items()}
-    for k, v in b.items():
-        if k in out:
-            out[k] = cast(Container, merge_reduce(out[k], v))
-        else:
-            out[k] = cast(Container, fill_in_defaults(v))
 
-    return out
-
-
-def merge_reduce_secs(a: HHDSettings, b: HHDSettings):
-    out = {k: merge_reduce_sec({}, v) for k, v in a.items()}
-    for k, v in b.items():
-        out[k] = merge_reduce_sec(out.get(k, {}), v)
-
-    return out
+def merge_settings(sets: Sequence[HHDSettings]):
+    """Merges the settings of all plugins, with later settings taking precedence.
+    All settings are flattened by path first and then the tree is built once."""
+    out = {}
+    flat = {}
+    for s in sets:
+        for sec_name, sec in s.items():
+            out.setdefault(sec_name, {})
+            for cont_name, cont in sec.items():
+                flatten_settings(cont, (sec_name, cont_name), flat)
+
+    # Parents are always visited before their children
+    for path, node in flat.items():
+        if len(path) == 2:
+            out[path[0]][path[1]] = node
+            continue
 
+        parent = flat[path[:-1]]
+        if parent["type"] == "container":
+            parent["children"][path[-1]] = node
+        else:
+            parent["modes"][path[-1]] = node
 
-def merge_settings(sets: Sequence[HHDSettings]):
-    if not sets:
-        return {}
-    if len(sets) > 1:
-        return reduce(merge_reduce_secs, sets)
-    return merge_reduce_secs({}, sets[0])
+    return cast(HHDSettings, out)
 
 
 def generate_desc(s: Setting | Container | Mode):
-    desc = f"*{s['title']}*\n"
+    parts = [f"*{s['title']}*\n"]
     if h := s.get("hint", None):
-        line = ""
-        for token in h.split(" "):
-            if len(line) + len(token) > 80:
-                desc += f"{line}\n"
-                line = ""
-            line += f"{token} "
-        if line:
-            desc += f"{line}\n"
+        parts.extend(
+            f"{line}\n"
+            for line in textwrap.wrap(
+                h, width=80, break_long_words=False, break_on_hyphens=False
+            )
+        )
 
     match s["type"]:
         case "mode":
-            desc += f"- modes: [{', '.join(map(str, s['modes']))}]\n"
+            parts.append(f"- modes: [{', '.join(map(str, s['modes']))}]\n")
         case "number":
-            desc += f"- numerical: ["
-            desc += f"{s['min'] if s.get('min', None) is not None else '-inf'}, "
-            desc += f"{s['max'] if s.get('max', None) is not None else '+inf'}]\n"
+            lo = s.get("min", None)
+            hi = s.get("max", None)
+            parts.append(
+                f"- numerical: ["
+                f"{lo if lo is not None else '-inf'}, "
+                f"{hi if hi is not None else '+inf'}]\n"
+            )
         case "bool":
-            desc += f"- boolean: [False, True]\n"
+            parts.append(f"- boolean: [False, True]\n")
         case "multiple" | "discrete":
-            desc += f"- options: [{', '.join(map(str, s['options']))}]\n"
+            parts.append(f"- options: [{', '.join(map(str, s['options']))}]\n")
 
     if (d := s.get("default", None)) is not None:
-        desc += f"- default: {d}\n"
-    return desc[:-1]
-
-
-def traverse_desc(set: Setting | Container | Mode, prev: Sequence[str]):
-    out = []
-    out.append(
-        (
-            prev,
+        parts.append(f"- default: {d}\n")
+    # Drop the trailing newline
+    return "".join(parts)[:-1]
+
+
+def traverse_desc(
+    set: Setting | Container | Mode, prefix: str, depth: int
+) -> Iterator[tuple[str, str, int, bool]]:
+    # Explicit stack, children are pushed in reverse to keep the tree order
+    stack = [(set, prefix, depth)]
+    while stack:
+        set, prefix, depth = stack.pop()
+        t = set["type"]
+        yield (
+            prefix,
             generate_desc(set),
-            max(len(prev) - 1, 0),
-            set["type"] in ("mode", "container"),
+            max(depth - 1, 0),
+            t in ("mode", "container"),
         )
-    )
-    match set["type"]:
-        case "container":
-            for child_name, child in set["children"].items():
-                out.extend(traverse_desc(child, [*prev, child_name]))
-        case "mode":
-            for mode_name, mode in set["modes"].items():
-                out.extend(traverse_desc(mode, [*prev, mode_name]))
-    return out
+        match t:
+            case "container":
+                stack.extend(
+                    (child, f"{prefix}.{child_name}", depth + 1)
+                    for child_name, child in reversed(set["children"].items())
+                )
+            case "mode":
+                stack.extend(
+                    (mode, f"{prefix}.{mode_name}", depth + 1)
+                    for mode_name, mode in reversed(set["modes"].items())
+                )
 
 
 def tranverse_desc_sec(set: HHDSettings):
-    out = []
-    for sec_name, sec in set.items():
-        for cont_name, cnt in sec.items():
-            out.extend(traverse_desc(cnt, [sec_name, cont_name]))
-    return out
-
+    return list(
+        chain.from_iterable(
+            traverse_desc(cnt, f"{sec_name}.{cont_name}", 2)
+            for sec_name, sec in set.items()
+            for cont_name, cnt in sec.items()
+        )
+    )
 
-def dump_comment(set: HHDSettings, header: str = STATE_HEADER):
-    from hhd import RASTER
 
-    out = "#\n#  "
-    out += "\n#  ".join(RASTER.split("\n"))
-    out += header
+def render_descs(set: HHDSettings):
     descs = tranverse_desc_sec(set)
-    for i, (path, desc, ofs, is_container) in enumerate(descs):
-        out += f"\n# {'│' * max((ofs - 1), 0)}┌> {'.'.join(path)}\n# {'│' * ofs} "
+    depth = max((ofs for _, _, ofs, _ in descs), default=0) + 1
+    # Precomputed so that indexing by depth does not allocate
+    bars = ["│" * i for i in range(depth)]
+    ends = ["└" * i for i in range(depth)]
+
+    parts = [""]
+    # Pair every description with the next one, the last with None
+    for (path, desc, ofs, is_container), nxt in pairwise(chain(descs, [None])):
+        parts.append(f"# {bars[max(ofs - 1, 0)]}┌> {path}")
         lines = desc.split("\n")
-        out += ("\n# " + "│" * ofs + " ").join(lines[:-1])
+        prefix = f"# {bars[ofs]} "
+        parts.extend(prefix + l for l in lines[:-1] or [""])
 
-        next_ofs = descs[i + 1][2] if i < len(descs) - 1 else 0
+        next_ofs = nxt[2] if nxt else 0
         if not is_container:
             next_ofs -= 1
         next_ofs = max(min(next_ofs, ofs), 0)
-        out += f"\n# {'│' * next_ofs}{'└' * (ofs - next_ofs)} {lines[-1]}"
-        out += f"\n# {'│' * next_ofs}"
-    out += "\n\n"
-    return out
+        parts.append(f"# {bars[next_ofs]}{ends[ofs - next_ofs]} {lines[-1]}")
+        parts.append(f"# {bars[next_ofs]}")
+    return "\n".join(parts) + "\n\n"
+
+
+def dump_header(header: str = STATE_HEADER):
+    # hhd imports the plugins package through hhd.logging, so this has to stay
+    # a local import to avoid a circular import
+    from hhd import RASTER
+
+    return "#\n#  " + "\n#  ".join(RASTER.split("\n")) + header
+
+
+# Settings are not modified after being merged, so the rendered descriptions
+# and hash of the last settings object are cached together by identity.
+_settings_cache: tuple[HHDSettings, str, str] | None = None
+
+
+def render_settings(set: HHDSettings):
+    """Returns the rendered descriptions and hash of the settings. The comment
+    is only rendered and encoded once per settings object."""
+    global _settings_cache
+    if _settings_cache is None or _settings_cache[0] is not set:
+        descs = render_descs(set)
+        shash = _md5((dump_header() + descs).encode()).hexdigest()[:8]
+        _settings_cache = (set, descs, shash)
+    return _settings_cache[1], _settings_cache[2]
+
+
+def dump_descs(set: HHDSettings):
+    return render_settings(set)[0]
+
+
+def dump_comment(set: HHDSettings, header: str = STATE_HEADER):
+    return dump_header(header) + dump_descs(set)
+
+
+def write_comment(f: TextIO, set: HHDSettings, header: str = STATE_HEADER):
+    """Writes the comment of `dump_comment` to `f` without joining it first."""
+    f.write(dump_header(header))
+    f.write(dump_descs(set))
 
 
 def dump_setting(
     set: Container | Mode,
-    prev: Sequence[str],
-    conf: Config,
+    conf: Mapping | Any,
     unmark: Literal["unset", "default"] = "default",
 ):
     """Finds the current settings that are set to a default value and swaps them
     for the value `default`. For settings without a default value (temporary),
-    it sets them to None to avoid setting them."""
+    it sets them to None to avoid setting them.
+
+    `conf` is the part of the configuration that matches `set`, so values are
+    looked up while walking instead of by path for every setting."""
+    if not isinstance(conf, Mapping):
+        conf = {}
+
     match set["type"]:
         case "container":
             out = {}
             for child_name, child in set["children"].items():
                 match child["type"]:
                     case "container" | "mode":
-                        s = dump_setting(child, [*prev, child_name], conf, unmark)
+                        s = dump_setting(child, conf.get(child_name, None), unmark)
                         if s:
                             out[child_name] = s
                     case _:
-                        m = conf.get([*prev, child_name], None)
+                        m = conf.get(child_name, None)
                         # Skip writing default values
                         default = child.get("default", None)
                         if default is None:
@@ -415,7 +486,7 @@ def dump_setting(
             return out
         case "mode":
             out = {}
-            m = conf.get([*prev, "mode"], None)
+            m = conf.get("mode", None)
             # Skip writing default values
             default = set.get("default", None)
             if default is None:
@@ -426,27 +497,29 @@ def dump_setting(
                 out["mode"] = unmark
 
             for mode_name, mode in set["modes"].items():
-                s = dump_setting(mode, [*prev, mode_name], conf, unmark)
+                s = dump_setting(mode, conf.get(mode_name, None), unmark)
                 if s:
                     out[mode_name] = s
             return out
 
 
-def merge_dicts(a: Mapping | Any, b: Mapping | Any):
-    if isinstance(a, Mapping) and isinstance(b, Mapping):
-        out = dict(a)
-        for k, v in b.items():
-            out[k] = merge_dicts(out.get(k, None), v)
-    elif isinstance(b, Mapping):
-        out = {}
-        for k, v in b.items():
-            out[k] = merge_dicts(None, v)
-    else:
-        return b
-
-    for k in list(out.keys()):
-        if out[k] is None:
-            del out[k]
+def apply_overlay(base: Mapping | Any, overlay: Mapping | Any):
+    """Applies `overlay` on top of `base`. Only the mappings along the paths of
+    `overlay` are copied, the rest of `base` is shared. A `None` value in
+    `overlay` removes the key and mappings that end up empty are dropped."""
+    if not isinstance(overlay, Mapping):
+        return overlay
+
+    out = dict(base) if isinstance(base, Mapping) else {}
+    for k, v in overlay.items():
+        # Most values are leaves (or None), only recurse for mappings
+        if isinstance(v, Mapping):
+            out[k] = apply_overlay(out.get(k, None), v)
+        else:
+            out[k] = v
+
+    # Drop removed keys while keeping the order of `base`
+    out = {k: v for k, v in out.items() if v is not None}
     if not out:
         return None
     return out
@@ -458,38 +531,57 @@ def dump_settings(
     """Fixes default values for settings in set, drops settings without a default value,
     and retains the rest of the configuration, to not mess with plugins that
     were not loaded."""
+    state = cast(Mapping, conf.conf)
     out: dict = {"version": get_settings_hash(set)}
     for sec_name, sec in set.items():
         out[sec_name] = {}
+        sec_state = state.get(sec_name, None)
+        if not isinstance(sec_state, Mapping):
+            sec_state = {}
         for cont_name, cnt in sec.items():
-            s = dump_setting(cnt, [sec_name, cont_name], conf, unmark)
+            s = dump_setting(cnt, sec_state.get(cont_name, None), unmark)
             if s:
                 out[sec_name][cont_name] = s
 
     # Merge dicts to maintain settings for plugins that did not run
-    return merge_dicts({"version": None, **cast(Mapping, conf.conf)}, out)
+    return apply_overlay({"version": None, **state}, out)
 
 
-def save_state_yaml(fn: str, set: HHDSettings, conf: Config):
-    import yaml
+@contextmanager
+def open_atomic(fn: str):
+    """Opens a temporary file for writing, which replaces `fn` once closed
+    so that readers never see a partial file."""
+    tmp = fn + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            yield f
+        os.replace(tmp, fn)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
+
+def save_state_yaml(fn: str, set: HHDSettings, conf: Config):
     shash = get_settings_hash(set)
     if conf.get("version", None) == shash and not conf.updated:
         return False
 
     conf["version"] = shash
-    with open(fn, "w") as f:
-        f.write(dump_comment(set, STATE_HEADER))
-        yaml.safe_dump(
-            dump_settings(set, conf, "default"), f, width=85, sort_keys=False
+    with open_atomic(fn) as f:
+        write_comment(f, set, STATE_HEADER)
+        yaml.dump(
+            dump_settings(set, conf, "default"),
+            f,
+            Dumper=_Dumper,
+            width=85,
+            sort_keys=False,
         )
 
     return True
 
 
 def save_profile_yaml(fn: str, set: HHDSettings, conf: Config | None = None):
-    import yaml
-
     shash = get_settings_hash(set)
     if conf is None:
         conf = Config({})
@@ -497,64 +589,89 @@ def save_profile_yaml(fn: str, set: HHDSettings, conf: Config | None = None):
         return False
 
     conf["version"] = shash
-    with open(fn, "w") as f:
-        f.write(dump_comment(set, PROFILE_HEADER))
-        yaml.safe_dump(dump_settings(set, conf, "unset"), f, width=85, sort_keys=False)
+    with open_atomic(fn) as f:
+        write_comment(f, set, PROFILE_HEADER)
+        yaml.dump(
+            dump_settings(set, conf, "unset"),
+            f,
+            Dumper=_Dumper,
+            width=85,
+            sort_keys=False,
+        )
     return True
 
 
-def strip_defaults(c):
-    if c == "default" or c == "unset":
-        return None
-    if not isinstance(c, Mapping):
-        return c
+_UNSET_VALUES = frozenset(("default", "unset"))
 
-    out = {}
-    for k, v in c.items():
-        l = strip_defaults(v)
-        if l is not None:
-            out[k] = l
 
-    if not out:
+def strip_defaults(c):
+    """Removes `default`/`unset` placeholders, `None` values and empty mappings.
+    Mappings without anything to remove are returned as is, without a copy."""
+    if isinstance(c, Mapping):
+        out = None
+        for i, (k, v) in enumerate(c.items()):
+            l = strip_defaults(v)
+            if out is None and (l is None or l is not v):
+                # First change, copy the values before it
+                out = dict(islice(c.items(), i))
+            if out is not None and l is not None:
+                out[k] = l
+
+        if out is None:
+            return c or None
+        return out or None
+    if isinstance(c, str) and c in _UNSET_VALUES:
         return None
-    return out
+    return c
 
 
 def get_default_state(set: HHDSettings):
     return Config(parse_defaults(set))
 
 
-def load_state_yaml(fn: str, set: HHDSettings):
-    import yaml
+# Parsed files by path, reused while the file on disk has not changed
+_yaml_cache: dict[str, tuple[tuple[int, int, int], Any]] = {}
+
 
+def load_yaml(fn: str):
+    """Loads a yaml file, reusing the previous result if the file is unchanged.
+    Saves replace the file, so its inode changes on every write."""
+    with open(fn, "r") as f:
+        st = os.fstat(f.fileno())
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if (cached := _yaml_cache.get(fn, None)) and cached[0] == key:
+            return cached[1]
+        data = yaml.load(f, Loader=_Loader)
+
+    _yaml_cache[fn] = (key, data)
+    return data
+
+
+def load_state_yaml(fn: str, set: HHDSettings):
     defaults = parse_defaults(set)
     try:
-        with open(fn, "r") as f:
-            state = cast(Mapping, strip_defaults(yaml.safe_load(f)) or {})
+        state = cast(Mapping, strip_defaults(load_yaml(fn)) or {})
     except FileNotFoundError:
-        logger.warning(f"State file not found. Searched location:\n{fn}")
+        logger.warning("State file not found. Searched location:\n%s", fn)
         return None
     except yaml.YAMLError:
-        logger.warning(f"State file is invalid. Searched location:\n{fn}")
+        logger.warning("State file is invalid. Searched location:\n%s", fn)
         return None
 
     return Config([defaults, state])
 
 
 def load_profile_yaml(fn: str):
-    import yaml
-
     try:
-        with open(fn, "r") as f:
-            state = cast(Mapping, strip_defaults(yaml.safe_load(f)) or {})
+        state = cast(Mapping, strip_defaults(load_yaml(fn)) or {})
     except FileNotFoundError:
         logger.warning(
-            f"Profile file not found, using defaults. Searched location:\n{fn}"
+            "Profile file not found, using defaults. Searched location:\n%s", fn
         )
         return None
     except yaml.YAMLError:
         logger.warning(
-            f"Profile file is invalid, skipping loading. Searched location:\n{fn}"
+            "Profile file is invalid, skipping loading. Searched location:\n%s", fn
         )
         return None
 
@@ -562,31 +679,28 @@ def load_profile_yaml(fn: str):
 
 
 def get_settings_hash(set: HHDSettings):
-    import hashlib
-
-    return hashlib.md5(dump_comment(set).encode()).hexdigest()[:8]
+    return render_settings(set)[1]
 
 
-def unravel(d: Setting | Container | Mode, prev: Sequence[str], out: MutableMapping):
-    new_prev = list(prev)
+def unravel(d: Setting | Container | Mode, prefix: str, out: MutableMapping):
     match d["type"]:
         case "container":
             for k, v in d["children"].items():
-                unravel(v, new_prev + [k], out)
+                unravel(v, f"{prefix}.{k}", out)
         case "mode":
-            out[".".join(new_prev) + ".mode"] = d
+            out[prefix + ".mode"] = d
 
             for k, v in d["modes"].items():
-                unravel(v, new_prev + [k], out)
+                unravel(v, f"{prefix}.{k}", out)
         case _:
-            out[".".join(new_prev)] = d
+            out[prefix] = d
 
 
 def unravel_options(settings: HHDSettings):
     options: Mapping[str, Setting | Mode] = {}
     for name, sec in settings.items():
         for cname, cont in sec.items():
-            unravel(cont, [name, cname], options)
+            unravel(cont, f"{name}.{cname}", options)
 
     return options
 
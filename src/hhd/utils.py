@@ -133,4 +133,8 @@ def expanduser(path: str, user: int | str | Context | None = None):
 
 
 def fix_perms(fn: str, ctx: Context):
+    # Files created while running as the target user already have the right
+    # owner, so skip the redundant chown
+    if os.geteuid() == ctx.euid and os.getegid() == ctx.egid:
+        return
     os.chown(fn, ctx.euid, ctx.egid)